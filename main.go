@@ -3,158 +3,236 @@ package main
 // Imports
 import (
 	"encoding/json"
-	"io/ioutil"
+	"errors"
+	"net/url"
+	"io"
 	"strconv"
 	"math/rand"
 	"net/http"
+	"runtime"
 	"os/exec"
 	"strings"
 	"bufio"
 	"time"
 	"fmt"
+	"path/filepath"
 	"os"
 )
 
+// Input and output files
+var (
+	wlidPath    = filepath.Join("input", "WLID.txt")
+	codesPath   = filepath.Join("input", "codes.txt")
+	workingPath = filepath.Join("output", "working.txt")
+	usedPath    = filepath.Join("output", "used.txt")
+	invalidPath = filepath.Join("output", "invalid.txt")
+	errorsPath  = filepath.Join("output", "errors.txt")
+)
+
+// Console colors
+const (
+	colorRed   = "\033[31m"
+	colorGreen = "\033[32m"
+	colorCyan  = "\033[36m"
+	colorReset = "\033[0m"
+)
+
+// Minimum time between progress title updates, each one spawns a process. Only
+// applied to bursts of short codes, the title is always updated before a request
+const titleInterval = 100 * time.Millisecond
+
+// Codes shorter than this are invalid without sending a request
+const minCodeLength = 18
+
+// Times a failed request is retried before its code is saved to errors.txt
+const maxRetries = 3
+
+// Returned by checkCode when no request can be built for a code, retrying won't help
+var errBadCode = errors.New("code can't be sent in a request")
+
+// Headers sent with every request, the authorization header is added per request
+var requestHeaders = http.Header{
+	"Accept":          {"application/json, text/javascript, */*; q=0.01"},
+	"Accept-Language": {"en-US,en;q=0.8"},
+	"Origin":          {"https://www.microsoft.com"},
+	"Referer":         {"https://www.microsoft.com/"},
+	"Sec-Fetch-Dest":  {"empty"},
+	"Sec-Fetch-Mode":  {"cors"},
+	"Sec-Fetch-Site":  {"same-site"},
+	"Sec-Gpc":         {"1"},
+	"User-Agent":      {"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36"},
+}
+
+// Fields read from a tokenDescriptions response
+type tokenResponse struct {
+	TokenState string `json:"tokenState"`
+	Code       string `json:"code"`
+}
+
+// Token states returned by the tokenDescriptions endpoint
+const (
+	tokenActive   = "Active"
+	tokenRedeemed = "Redeemed"
+)
+
+// Error codes returned by the tokenDescriptions endpoint
+const (
+	codeNotFound     = "NotFound"
+	codeUnauthorized = "Unauthorized"
+)
+
 func main() {
 
-	// Clear console
-	cmd := exec.Command("cmd", "/c", "cls")
-	cmd.Stdout = os.Stdout
-	cmd.Run()
+	// Clear console, running cmd on Windows also enables the ANSI colors used below
+	if runtime.GOOS == "windows" {
+		cmd := exec.Command("cmd", "/c", "cls")
+		cmd.Stdout = os.Stdout
+		cmd.Run()
+	} else {
+		fmt.Print("\033[H\033[2J")
+	}
 
 	// Title screen
 	setTitle("Xbox Code Checker | Made by Tainted | github.com/Tainted06/Xbox-Code-Checker")
-	fmt.Println("\033[36m █ █ ██▄ ███ █ █    ███ ███ ██▄ ███    ███ █ █ ███ ███ █ █ ███ ███\n  █  █▄█ █ █  █     █   █ █ █ █ █▄     █   █▄█ █▄  █   ██▄ █▄  █▄ \n █ █ █▄█ █▄█ █ █    ███ █▄█ ███ █▄▄    ███ █ █ █▄▄ ███ █ █ █▄▄ █ █\n By: Tainted [tainted.dev] [github.com/Tainted06]\n\033[0m")
+	fmt.Println(colorCyan + " █ █ ██▄ ███ █ █    ███ ███ ██▄ ███    ███ █ █ ███ ███ █ █ ███ ███\n  █  █▄█ █ █  █     █   █ █ █ █ █▄     █   █▄█ █▄  █   ██▄ █▄  █▄ \n █ █ █▄█ █▄█ █ █    ███ █▄█ ███ █▄▄    ███ █ █ █▄▄ ███ █ █ █▄▄ █ █\n By: Tainted [tainted.dev] [github.com/Tainted06]\n" + colorReset)
 
 	// Reading WLID(s)
-	wlid, err := os.Open("input\\WLID.txt")
-	if err != nil {
-		fmt.Println("\033[31m", err)
-		time.Sleep(5 * time.Second)
-		os.Exit(1)
-	}
-	fileScannerWLIDs := bufio.NewScanner(wlid)
-	fileScannerWLIDs.Split(bufio.ScanLines)
 	var wlids []string
-	for fileScannerWLIDs.Scan() {
-		if strings.Contains(fileScannerWLIDs.Text(), "WLID1.0=") {
-			wlids = append(wlids, string(fileScannerWLIDs.Text()))
+	for _, line := range readLines(wlidPath) {
+		if strings.Contains(line, "WLID1.0=") {
+			wlids = append(wlids, line)
 		} else {
-			wlids = append(wlids, "WLID1.0=\"" + string(fileScannerWLIDs.Text()) + "\"")
-		}		
+			wlids = append(wlids, "WLID1.0=\"" + line + "\"")
+		}
 	}
 	if len(wlids) == 0 {
-		fmt.Println("\033[31m No WLIDs found in input\\WLID.txt")
-		time.Sleep(5 * time.Second)
-		os.Exit(1)
-	}
-
-	// Reading codes
-	codes_file, err := os.Open("input\\codes.txt")
-	if err != nil {
-		fmt.Println("\033[31m", err)
+		fmt.Println(colorRed + " No WLIDs found in " + wlidPath)
 		time.Sleep(5 * time.Second)
 		os.Exit(1)
 	}
 
-	// Go through each line
-	fileScannerCodes := bufio.NewScanner(codes_file)
-	fileScannerCodes.Split(bufio.ScanLines)
+	// Reading codes, skipping duplicates (codes aren't case-sensitive)
 	var codes []string
-	for fileScannerCodes.Scan() {
-		codes = append(codes, string(fileScannerCodes.Text()))
+	seen_codes := make(map[string]bool)
+	duplicates := 0
+	for _, line := range readLines(codesPath) {
+		key := strings.ToUpper(line)
+		if seen_codes[key] {
+			duplicates++
+			continue
+		}
+		seen_codes[key] = true
+		codes = append(codes, line)
+	}
+	if duplicates > 0 {
+		fmt.Println(colorCyan, "Skipped "+strconv.Itoa(duplicates)+" duplicate code(s) in "+codesPath)
 	}
 	if len(codes) == 0 {
-		fmt.Println("\033[31m No codes found in input\\codes.txt")
+		fmt.Println(colorRed + " No codes found in " + codesPath)
 		time.Sleep(5 * time.Second)
 		os.Exit(1)
 	}
 
+	// Opening output files
+	working_file := openOutput(workingPath)
+	defer working_file.Close()
+	used_file := openOutput(usedPath)
+	defer used_file.Close()
+	invalid_file := openOutput(invalidPath)
+	defer invalid_file.Close()
+	errors_file := openOutput(errorsPath)
+	defer errors_file.Close()
+
 	// Starting amount
 	startamt := len(codes)
+	startamt_str := strconv.Itoa(startamt)
+	var last_title_update time.Time
+	retries := 0
+	// One client for every request so connections are reused
+	client := &http.Client{Timeout: 30 * time.Second}
 	// Iterating through codes
 	for {
 
 		// Set title
-		percent_done := strconv.Itoa((startamt - len(codes)) * 100 / startamt)
-		setTitle("Xbox Code Checker | github.com/Tainted06/Xbox-Code-Checker | " + strconv.Itoa(startamt - len(codes)) + "/" + strconv.Itoa(startamt) + " codes checked | " + percent_done + "% done")
+		if len(codes) == 0 || len(codes[0]) >= minCodeLength || time.Since(last_title_update) >= titleInterval {
+			checked := startamt - len(codes)
+			percent_done := strconv.Itoa(checked * 100 / startamt)
+			setTitle("Xbox Code Checker | github.com/Tainted06/Xbox-Code-Checker | " + strconv.Itoa(checked) + "/" + startamt_str + " codes checked | " + percent_done + "% done")
+			last_title_update = time.Now()
+		}
 
 		// Check if codes is empty
 		if len(codes) != 0 {
 
-			// Checking if codes is less than 18 characters
-			if len(codes[0]) < 18 {
-				fmt.Println("\033[31m", " [-] "+codes[0]+" is invalid!")
-				f, _ := os.OpenFile("output\\invalid.txt", os.O_APPEND|os.O_WRONLY|os.O_CREATE, 0600)
-				defer f.Close()
-				f.WriteString(codes[0] + "\n")
+			// Checking if codes is less than minCodeLength characters
+			if len(codes[0]) < minCodeLength {
+				fmt.Println(colorRed, " [-] "+codes[0]+" is invalid!")
+				saveCode(invalid_file, codes[0])
 
-				// Remove code from slice
+				// Remove code from slice, clearing it first so the string can be freed
+				codes[0] = ""
 				codes = codes[1:]
 
 			} else {
 
 			// Sending request
-			client := &http.Client{}
-			req, err1 := http.NewRequest("GET", "https://purchase.mp.microsoft.com/v7.0/tokenDescriptions/"+codes[0]+"?market=US&language=en-US&supportMultiAvailabilities=true", nil)
-			req.Header.Add("accept", "application/json, text/javascript, */*; q=0.01")
-			req.Header.Add("accept-encoding", "gzip, deflate, br")
-			req.Header.Add("accept-language", "en-US,en;q=0.8")
-			req.Header.Add("authorization", string(wlids[rand.Intn(len(wlids))]))
-			req.Header.Add("origin", "https://www.microsoft.com")
-			req.Header.Add("referer", "https://www.microsoft.com/")
-			req.Header.Add("sec-fetch-dest", "empty")
-			req.Header.Add("sec-fetch-mode", "cors")
-			req.Header.Add("sec-fetch-site", "same-site")
-			req.Header.Add("sec-gpc", "1")
-			req.Header.Add("user-agent", "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/105.0.0.0 Safari/537.36")
-			resp, err2 := client.Do(req)
+			status, content, err := checkCode(client, codes[0], wlids[rand.Intn(len(wlids))])
 
 			// Parsing json
-			content, err3 := (ioutil.ReadAll(resp.Body))
-			var json_content map[string]interface{}
-			json.Unmarshal([]byte(content), &json_content)
+			var json_content tokenResponse
+			json.Unmarshal(content, &json_content)
 
-			// Checking for ratelimit
-			if resp.StatusCode == 429 {
-				fmt.Println("\033[31m", " [-] Ratelimit! [Try adding more WLIDs or waiting for the ratelimit to finish]")
+			masked := codes[0][0:17] + "-XXXXX-XXXXX"
+
+			// Checking for ratelimit and failed requests, both retry the same code
+			if err == nil && status == 429 {
+				fmt.Println(colorRed, " [-] Ratelimit! [Try adding more WLIDs or waiting for the ratelimit to finish]")
+				time.Sleep(5 * time.Second)
+			} else if failure := requestFailure(status, err); failure != "" && retries < maxRetries {
+				retries++
+				fmt.Println(colorRed, " [-] Error checking "+masked+": "+failure+" [retry "+strconv.Itoa(retries)+"/"+strconv.Itoa(maxRetries)+"]")
 				time.Sleep(5 * time.Second)
 			} else
 
 			// Checking response
 			{
-				if err1 != nil || err2 != nil || err3 != nil {
-					fmt.Println("\033[31m", " [-] Error: ", err1, err2, err3)
-				} else if strings.Contains(string(content), "tokenState") {
-					tknstate := json_content["tokenState"].(string)
-					if string(tknstate) == "Active" {
-						fmt.Println("\033[32m", " [+] "+codes[0][0:17]+"-XXXXX-XXXXX is valid!")
-						f, _ := os.OpenFile("output\\working.txt", os.O_APPEND|os.O_WRONLY|os.O_CREATE, 0600)
-						defer f.Close()
-						f.WriteString(codes[0] + "\n")
-					} else if string(tknstate) == "Redeemed" {
-						fmt.Println("\033[31m", " [-] "+codes[0][0:17]+"-XXXXX-XXXXX is used!")
-						f, _ := os.OpenFile("output\\used.txt", os.O_APPEND|os.O_WRONLY|os.O_CREATE, 0600)
-						defer f.Close()
-						f.WriteString(codes[0] + "\n")
+				if errors.Is(err, errBadCode) {
+					fmt.Println(colorRed, " [-] "+masked+" is invalid!")
+					saveCode(invalid_file, codes[0])
+				} else if failure != "" {
+					fmt.Println(colorRed, " [-] Error checking "+masked+": "+failure+" [saved to "+errorsPath+"]")
+					saveCode(errors_file, codes[0])
+				} else if json_content.TokenState != "" {
+					switch json_content.TokenState {
+					case tokenActive:
+						fmt.Println(colorGreen, " [+] "+masked+" is valid!")
+						saveCode(working_file, codes[0])
+					case tokenRedeemed:
+						fmt.Println(colorRed, " [-] "+masked+" is used!")
+						saveCode(used_file, codes[0])
+					default:
+						fmt.Println(colorRed, " [-] "+masked+" is "+json_content.TokenState)
+						saveCode(invalid_file, codes[0])
 					}
-				} else if json_content["code"] != "undefined" {
-					if json_content["code"] == "NotFound" {
-						fmt.Println("\033[31m", " [-] "+codes[0][0:17]+"-XXXXX-XXXXX is invalid!")
-						f, _ := os.OpenFile("output\\invalid.txt", os.O_APPEND|os.O_WRONLY|os.O_CREATE, 0600)
-						defer f.Close()
-						f.WriteString(codes[0] + "\n")
-					} else if json_content["code"] == "Unauthorized" {
-						fmt.Println("\033[31m", " [-] Error: Invalid WLID")
+				} else {
+					switch json_content.Code {
+					case codeNotFound:
+						fmt.Println(colorRed, " [-] "+masked+" is invalid!")
+						saveCode(invalid_file, codes[0])
+					case codeUnauthorized:
+						fmt.Println(colorRed, " [-] Error: Invalid WLID")
 						time.Sleep(5 * time.Second)
 						os.Exit(1)
+					default:
+						fmt.Println(colorRed, " [-] Error checking "+masked+": "+string(content)+" [saved to "+errorsPath+"]")
+						saveCode(errors_file, codes[0])
 					}
-				} else {
-					fmt.Println("\033[31m", " [-] Error: "+string(content))
 				}
 
-				// Remove code from slice
+				// Remove code from slice, clearing it first so the string can be freed
+				codes[0] = ""
 				codes = codes[1:]
+				retries = 0
 
 			}
 		}
@@ -163,12 +241,104 @@ func main() {
 		}
 	}
 
-	fmt.Println("\033[36m", "\nFinished checking codes!")
+	fmt.Println(colorCyan, "\nFinished checking codes!")
 	time.Sleep(30 * time.Second)
 }
 
-// Change console title
+// Send the request for a code, returning the status code and body
+func checkCode(client *http.Client, code string, wlid string) (int, []byte, error) {
+	req, err := http.NewRequest("GET", "https://purchase.mp.microsoft.com/v7.0/tokenDescriptions/"+url.PathEscape(code)+"?market=US&language=en-US&supportMultiAvailabilities=true", nil)
+	if err != nil {
+		return 0, nil, errBadCode
+	}
+	req.Header = requestHeaders.Clone()
+	req.Header.Set("Authorization", wlid)
+
+	resp, err := client.Do(req)
+	if err != nil {
+		return 0, nil, err
+	}
+	defer resp.Body.Close()
+
+	content, err := io.ReadAll(resp.Body)
+	return resp.StatusCode, content, err
+}
+
+// Describe a failed request worth retrying, empty if there is none
+func requestFailure(status int, err error) string {
+	if errors.Is(err, errBadCode) {
+		return ""
+	}
+	if err != nil {
+		// Only the cause, the request URL contains the full code
+		var url_err *url.Error
+		if errors.As(err, &url_err) {
+			return url_err.Err.Error()
+		}
+		return err.Error()
+	}
+	// 401 and 404 carry the Unauthorized and NotFound answers
+	if (status < 200 || status > 299) && status != 401 && status != 404 {
+		return "HTTP " + strconv.Itoa(status)
+	}
+	return ""
+}
+
+// Read the trimmed, non-empty lines of an input file, exiting if it can't be read
+func readLines(path string) []string {
+	f, err := os.Open(path)
+	if err != nil {
+		fmt.Println(colorRed, err)
+		time.Sleep(5 * time.Second)
+		os.Exit(1)
+	}
+	defer f.Close()
+
+	var lines []string
+	scanner := bufio.NewScanner(f)
+	for scanner.Scan() {
+		line := strings.TrimSpace(scanner.Text())
+		if line != "" {
+			lines = append(lines, line)
+		}
+	}
+	if err := scanner.Err(); err != nil {
+		fmt.Println(colorRed, err)
+		time.Sleep(5 * time.Second)
+		os.Exit(1)
+	}
+	return lines
+}
+
+// Open an output file for appending, exiting if it can't be opened
+func openOutput(path string) *os.File {
+	f, err := os.OpenFile(path, os.O_APPEND|os.O_WRONLY|os.O_CREATE, 0600)
+	if err != nil {
+		fmt.Println(colorRed, err)
+		time.Sleep(5 * time.Second)
+		os.Exit(1)
+	}
+	return f
+}
+
+// Append a code to an output file, exiting if it can't be written
+func saveCode(f *os.File, code string) {
+	if _, err := f.WriteString(code + "\n"); err != nil {
+		fmt.Println(colorRed, err)
+		time.Sleep(5 * time.Second)
+		os.Exit(1)
+	}
+}
+
+// Last title that was set, used to skip spawning cmd when nothing changed
+var lastTitle string
+
+// Change console title, only possible through cmd on Windows
 func setTitle(title string) {
+	if runtime.GOOS != "windows" || title == lastTitle {
+		return
+	}
+	lastTitle = title
 	cmd := exec.Command("cmd", "/C", "title", title)
 	cmd.Stdout = os.Stdout
 	cmd.Run()